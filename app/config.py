@@ -20,6 +20,9 @@ if raw:
 # fly serves on 8080 internally (we keep it fixed)
 PORT = int(os.getenv("PORT", "8080"))
 
+# max updates handled at once (webhook already acks before processing)
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "32"))
+
 # DB path (use /data only if volume mounted)
 DB_PATH = os.getenv("DB_PATH", "/data/bot.db")
 
@@ -28,6 +31,11 @@ FLOOD_MAX_MSG = int(os.getenv("FLOOD_MAX_MSG", "6"))
 REPEAT_MAX = int(os.getenv("REPEAT_MAX", "3"))
 LINK_SPAM_ENABLED = os.getenv("LINK_SPAM_ENABLED", "1") == "1"
 
+# comma-separated literal prefixes that count as a link (case-insensitive)
+LINK_PATTERNS = [
+    p.strip() for p in os.getenv("LINK_PATTERNS", "http://,https://,t.me/,www.").split(",") if p.strip()
+]
+
 DEFAULT_WELCOME = os.getenv("DEFAULT_WELCOME", "Welcome! ✅ Rules follow karo, spam mat karo 🙂")
 DEFAULT_RULES = os.getenv(
     "DEFAULT_RULES",
@@ -36,3 +44,6 @@ DEFAULT_RULES = os.getenv(
 
 # Webhook path = token (simple + secure)
 WEBHOOK_PATH = f"/{BOT_TOKEN}"
+
+# optional: Telegram echoes this in X-Telegram-Bot-Api-Secret-Token, others get 403
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or None
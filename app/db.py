@@ -1,95 +1,106 @@
 import sqlite3
+import threading
 from typing import Optional, Tuple
 from .config import DB_PATH
 
+_conn: Optional[sqlite3.Connection] = None
+# handlers call these via asyncio.to_thread, so access to the shared connection is serialized
+_lock = threading.Lock()
+
 def get_conn():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+    # one long-lived connection: no reopen per query, and WAL + synchronous=NORMAL
+    # means a commit appends to the log instead of fsyncing the db every time
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+        _conn.row_factory = sqlite3.Row
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+    return _conn
 
 def init_db():
-    conn = get_conn()
-    cur = conn.cursor()
+    with _lock:
+        conn = get_conn()
+        cur = conn.cursor()
 
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS user_strikes (
-        chat_id INTEGER NOT NULL,
-        user_id INTEGER NOT NULL,
-        strikes INTEGER NOT NULL DEFAULT 0,
-        last_reason TEXT,
-        updated_at INTEGER NOT NULL,
-        PRIMARY KEY (chat_id, user_id)
-    );
-    """)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS user_strikes (
+            chat_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            strikes INTEGER NOT NULL DEFAULT 0,
+            last_reason TEXT,
+            updated_at INTEGER NOT NULL,
+            PRIMARY KEY (chat_id, user_id)
+        );
+        """)
 
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS chat_settings (
-        chat_id INTEGER PRIMARY KEY,
-        welcome_text TEXT,
-        rules_text TEXT
-    );
-    """)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS chat_settings (
+            chat_id INTEGER PRIMARY KEY,
+            welcome_text TEXT,
+            rules_text TEXT
+        );
+        """)
 
-    conn.commit()
-    conn.close()
+        conn.commit()
 
 def get_chat_settings(chat_id: int) -> Tuple[Optional[str], Optional[str]]:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT welcome_text, rules_text FROM chat_settings WHERE chat_id=?", (chat_id,))
-    row = cur.fetchone()
-    conn.close()
-    if not row:
-        return None, None
-    return row["welcome_text"], row["rules_text"]
+    with _lock:
+        conn = get_conn()
+        cur = conn.cursor()
+        cur.execute("SELECT welcome_text, rules_text FROM chat_settings WHERE chat_id=?", (chat_id,))
+        row = cur.fetchone()
+        if not row:
+            return None, None
+        return row["welcome_text"], row["rules_text"]
 
 def set_welcome(chat_id: int, text: str):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO chat_settings(chat_id, welcome_text, rules_text)
-        VALUES(?, ?, COALESCE((SELECT rules_text FROM chat_settings WHERE chat_id=?), NULL))
-        ON CONFLICT(chat_id) DO UPDATE SET welcome_text=excluded.welcome_text
-    """, (chat_id, text, chat_id))
-    conn.commit()
-    conn.close()
+    with _lock:
+        conn = get_conn()
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO chat_settings(chat_id, welcome_text, rules_text)
+            VALUES(?, ?, COALESCE((SELECT rules_text FROM chat_settings WHERE chat_id=?), NULL))
+            ON CONFLICT(chat_id) DO UPDATE SET welcome_text=excluded.welcome_text
+        """, (chat_id, text, chat_id))
+        conn.commit()
 
 def set_rules(chat_id: int, text: str):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO chat_settings(chat_id, welcome_text, rules_text)
-        VALUES(?, COALESCE((SELECT welcome_text FROM chat_settings WHERE chat_id=?), NULL), ?)
-        ON CONFLICT(chat_id) DO UPDATE SET rules_text=excluded.rules_text
-    """, (chat_id, chat_id, text))
-    conn.commit()
-    conn.close()
+    with _lock:
+        conn = get_conn()
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO chat_settings(chat_id, welcome_text, rules_text)
+            VALUES(?, COALESCE((SELECT welcome_text FROM chat_settings WHERE chat_id=?), NULL), ?)
+            ON CONFLICT(chat_id) DO UPDATE SET rules_text=excluded.rules_text
+        """, (chat_id, chat_id, text))
+        conn.commit()
 
 def get_strikes(chat_id: int, user_id: int) -> int:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT strikes FROM user_strikes WHERE chat_id=? AND user_id=?", (chat_id, user_id))
-    row = cur.fetchone()
-    conn.close()
-    return int(row["strikes"]) if row else 0
+    with _lock:
+        conn = get_conn()
+        cur = conn.cursor()
+        cur.execute("SELECT strikes FROM user_strikes WHERE chat_id=? AND user_id=?", (chat_id, user_id))
+        row = cur.fetchone()
+        return int(row["strikes"]) if row else 0
 
 def set_strikes(chat_id: int, user_id: int, strikes: int, reason: str, ts: int):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO user_strikes(chat_id, user_id, strikes, last_reason, updated_at)
-        VALUES(?, ?, ?, ?, ?)
-        ON CONFLICT(chat_id, user_id) DO UPDATE SET
-            strikes=excluded.strikes,
-            last_reason=excluded.last_reason,
-            updated_at=excluded.updated_at
-    """, (chat_id, user_id, strikes, reason, ts))
-    conn.commit()
-    conn.close()
+    with _lock:
+        conn = get_conn()
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO user_strikes(chat_id, user_id, strikes, last_reason, updated_at)
+            VALUES(?, ?, ?, ?, ?)
+            ON CONFLICT(chat_id, user_id) DO UPDATE SET
+                strikes=excluded.strikes,
+                last_reason=excluded.last_reason,
+                updated_at=excluded.updated_at
+        """, (chat_id, user_id, strikes, reason, ts))
+        conn.commit()
 
 def forgive_user(chat_id: int, user_id: int):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM user_strikes WHERE chat_id=? AND user_id=?", (chat_id, user_id))
-    conn.commit()
-    conn.close()
+    with _lock:
+        conn = get_conn()
+        cur = conn.cursor()
+        cur.execute("DELETE FROM user_strikes WHERE chat_id=? AND user_id=?", (chat_id, user_id))
+        conn.commit()
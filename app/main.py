@@ -1,21 +1,20 @@
 import asyncio
 import logging
-import threading
-from typing import Optional
+from typing import Dict, Set
 
-from flask import Flask, request
-
-from telegram import Update, ChatPermissions
+from telegram import Update, Chat, ChatPermissions
+from telegram.constants import ChatType
 from telegram.ext import (
     Application,
+    ChatMemberHandler,
     CommandHandler,
     MessageHandler,
     ContextTypes,
     filters,
 )
 
-from .config import BOT_TOKEN, PUBLIC_URL, PORT, ADMIN_IDS
-from .db import init_db, forgive_user, set_rules, set_welcome, get_strikes
+from .config import BOT_TOKEN, PUBLIC_URL, PORT, ADMIN_IDS, WEBHOOK_SECRET, CONCURRENT_UPDATES, DEFAULT_RULES
+from .db import init_db, forgive_user, set_rules, set_welcome, get_strikes, get_chat_settings
 from .moderation import (
     check_flood,
     check_link_spam,
@@ -26,9 +25,39 @@ from .moderation import (
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 log = logging.getLogger("bot")
 
+_ADMIN_STATUSES = frozenset({"administrator", "creator"})
+
+_UNRESTRICT_PERMS = ChatPermissions(
+    can_send_messages=True,
+    can_send_polls=True,
+    can_send_other_messages=True,
+    can_add_web_page_previews=True,
+    can_invite_users=True,
+)
+
+_TEXT_OR_CAPTION = filters.TEXT | filters.CAPTION
+
+# owner commands from anyone else are dropped before the handler is scheduled
+OWNER_FILTER = filters.User(user_id=ADMIN_IDS)
+
+# chat_id -> admin user ids, warmed once per chat and kept fresh by chat_member updates
+_CHAT_ADMINS: Dict[int, Set[int]] = {}
 
-def _is_owner(uid: int) -> bool:
-    return uid in ADMIN_IDS
+
+async def _chat_admins(context: ContextTypes.DEFAULT_TYPE, chat: Chat) -> Set[int]:
+    admins = _CHAT_ADMINS.get(chat.id)
+    if admins is not None:
+        return admins
+    if chat.type == ChatType.PRIVATE:
+        admins = set()
+    else:
+        try:
+            members = await context.bot.get_chat_administrators(chat.id)
+        except Exception:
+            return set()
+        admins = {m.user.id for m in members}
+    _CHAT_ADMINS[chat.id] = admins
+    return admins
 
 
 def _reply_user(update: Update):
@@ -55,92 +84,67 @@ async def help_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def rules_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    from .db import get_chat_settings
-    from .config import DEFAULT_RULES
     chat = update.effective_chat
     if not chat:
         return
-    _, rules = get_chat_settings(chat.id)
+    _, rules = await asyncio.to_thread(get_chat_settings, chat.id)
     await update.effective_message.reply_text(rules or DEFAULT_RULES)
 
 
 async def setrules_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    u = update.effective_user
     c = update.effective_chat
-    if not u or not c or not _is_owner(u.id):
-        return
-    parts = update.effective_message.text.split(" ", 1)
-    if len(parts) < 2 or not parts[1].strip():
+    _, _, arg = update.effective_message.text.partition(" ")
+    arg = arg.strip()
+    if not arg:
         await update.effective_message.reply_text("Usage: /setrules <text>")
         return
-    set_rules(c.id, parts[1].strip())
+    await asyncio.to_thread(set_rules, c.id, arg)
     await update.effective_message.reply_text("✅ Rules updated")
 
 
 async def setwelcome_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    u = update.effective_user
     c = update.effective_chat
-    if not u or not c or not _is_owner(u.id):
-        return
-    parts = update.effective_message.text.split(" ", 1)
-    if len(parts) < 2 or not parts[1].strip():
+    _, _, arg = update.effective_message.text.partition(" ")
+    arg = arg.strip()
+    if not arg:
         await update.effective_message.reply_text("Usage: /setwelcome <text>")
         return
-    set_welcome(c.id, parts[1].strip())
+    await asyncio.to_thread(set_welcome, c.id, arg)
     await update.effective_message.reply_text("✅ Welcome updated")
 
 
 async def status_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    u = update.effective_user
     c = update.effective_chat
-    if not u or not c or not _is_owner(u.id):
-        return
     t = _reply_user(update)
     if not t:
         await update.effective_message.reply_text("Reply to user msg with /status")
         return
-    await update.effective_message.reply_text(f"User: {t.id}\nStrikes: {get_strikes(c.id, t.id)}")
+    strikes = await asyncio.to_thread(get_strikes, c.id, t.id)
+    await update.effective_message.reply_text(f"User: {t.id}\nStrikes: {strikes}")
 
 
 async def forgive_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    u = update.effective_user
     c = update.effective_chat
-    if not u or not c or not _is_owner(u.id):
-        return
     t = _reply_user(update)
     if not t:
         await update.effective_message.reply_text("Reply to user msg with /forgive")
         return
-    forgive_user(c.id, t.id)
+    await asyncio.to_thread(forgive_user, c.id, t.id)
     await update.effective_message.reply_text("✅ Strikes reset")
 
 
 async def unrestrict_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    u = update.effective_user
     c = update.effective_chat
-    if not u or not c or not _is_owner(u.id):
-        return
     t = _reply_user(update)
     if not t:
         await update.effective_message.reply_text("Reply to user msg with /unrestrict")
         return
-
-    perms = ChatPermissions(
-        can_send_messages=True,
-        can_send_polls=True,
-        can_send_other_messages=True,
-        can_add_web_page_previews=True,
-        can_invite_users=True,
-    )
-    await context.bot.restrict_chat_member(c.id, t.id, perms)
+    await context.bot.restrict_chat_member(c.id, t.id, _UNRESTRICT_PERMS)
     await update.effective_message.reply_text("✅ Unrestricted")
 
 
 async def ban_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    u = update.effective_user
     c = update.effective_chat
-    if not u or not c or not _is_owner(u.id):
-        return
     t = _reply_user(update)
     if not t:
         await update.effective_message.reply_text("Reply to user msg with /ban")
@@ -149,6 +153,24 @@ async def ban_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.effective_message.reply_text("⛔ Banned")
 
 
+async def chat_member_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if update.my_chat_member:
+        # bot's own rights changed, re-fetch the admin list on next message
+        _CHAT_ADMINS.pop(update.my_chat_member.chat.id, None)
+        return
+    cm = update.chat_member
+    if not cm:
+        return
+    admins = _CHAT_ADMINS.get(cm.chat.id)
+    if admins is None:
+        return
+    uid = cm.new_chat_member.user.id
+    if cm.new_chat_member.status in _ADMIN_STATUSES:
+        admins.add(uid)
+    else:
+        admins.discard(uid)
+
+
 async def new_members(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await send_welcome_if_any(update, context)
 
@@ -159,18 +181,13 @@ async def on_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     if not msg or not chat or not user:
         return
-    if not msg.text and not msg.caption:
-        return
 
     # admin bypass
-    try:
-        m = await context.bot.get_chat_member(chat.id, user.id)
-        if m.status in ("administrator", "creator"):
-            return
-    except Exception:
-        pass
+    if user.id in await _chat_admins(context, chat):
+        return
 
-    text = msg.text or msg.caption or ""
+    # _TEXT_OR_CAPTION guarantees one of them is non-empty
+    text = msg.text or msg.caption
     if check_flood(chat.id, user.id, text):
         await apply_punishment(update, context, "Flood/Repeated messages")
         return
@@ -180,71 +197,62 @@ async def on_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 def build_app() -> Application:
-    app = Application.builder().token(BOT_TOKEN).build()
+    app = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        # slow handlers (restrict/ban calls) must not queue up every other update
+        .concurrent_updates(CONCURRENT_UPDATES)
+        # all Bot API calls multiplexed over one kept-alive HTTP/2 connection
+        .http_version("2")
+        .build()
+    )
 
-    app.add_handler(CommandHandler("start", start_cmd))
-    app.add_handler(CommandHandler("help", help_cmd))
-    app.add_handler(CommandHandler("rules", rules_cmd))
+    app.add_handler(CommandHandler("start", start_cmd, block=False))
+    app.add_handler(CommandHandler("help", help_cmd, block=False))
+    app.add_handler(CommandHandler("rules", rules_cmd, block=False))
 
-    app.add_handler(CommandHandler("setrules", setrules_cmd))
-    app.add_handler(CommandHandler("setwelcome", setwelcome_cmd))
-    app.add_handler(CommandHandler("status", status_cmd))
-    app.add_handler(CommandHandler("forgive", forgive_cmd))
-    app.add_handler(CommandHandler("unrestrict", unrestrict_cmd))
-    app.add_handler(CommandHandler("ban", ban_cmd))
+    app.add_handler(CommandHandler("setrules", setrules_cmd, filters=OWNER_FILTER, block=False))
+    app.add_handler(CommandHandler("setwelcome", setwelcome_cmd, filters=OWNER_FILTER, block=False))
+    app.add_handler(CommandHandler("status", status_cmd, filters=OWNER_FILTER, block=False))
+    app.add_handler(CommandHandler("forgive", forgive_cmd, filters=OWNER_FILTER, block=False))
+    app.add_handler(CommandHandler("unrestrict", unrestrict_cmd, filters=OWNER_FILTER, block=False))
+    app.add_handler(CommandHandler("ban", ban_cmd, filters=OWNER_FILTER, block=False))
 
-    app.add_handler(MessageHandler(filters.StatusUpdate.NEW_CHAT_MEMBERS, new_members))
-    app.add_handler(MessageHandler(filters.TEXT | filters.Caption(True), on_message))
+    app.add_handler(ChatMemberHandler(chat_member_update, ChatMemberHandler.ANY_CHAT_MEMBER))
+    app.add_handler(MessageHandler(filters.StatusUpdate.NEW_CHAT_MEMBERS, new_members, block=False))
+    # on_message stays blocking so a raid is still capped by CONCURRENT_UPDATES
+    app.add_handler(MessageHandler(_TEXT_OR_CAPTION, on_message))
 
     return app
 
 
-# -------------------- Flask Webhook Server --------------------
-
-def start_flask_server(loop: asyncio.AbstractEventLoop, application: Application):
-    flask_app = Flask(__name__)
-
-    @flask_app.get("/")
-    def health():
-        return "OK", 200
-
-    @flask_app.post(f"/{BOT_TOKEN}")
-    def telegram_webhook():
-        data = request.get_json(force=True, silent=True) or {}
-        update = Update.de_json(data, application.bot)
-
-        # push update into PTB async processing
-        asyncio.run_coroutine_threadsafe(application.process_update(update), loop)
-        return "OK", 200
-
-    # MUST listen on 0.0.0.0 and PORT for Fly
-    flask_app.run(host="0.0.0.0", port=PORT)
+# -------------------- Webhook Server --------------------
 
+def main():
+    # libuv-based loop for the webhook server; stock asyncio where uvloop isn't available (Windows)
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
 
-async def main_async():
     init_db()
     application = build_app()
 
-    await application.initialize()
-    await application.start()
-
-    # Set webhook (auto)
     webhook_url = f"{PUBLIC_URL}/{BOT_TOKEN}"
-    log.info("Setting webhook: %s", webhook_url)
-    await application.bot.set_webhook(url=webhook_url, drop_pending_updates=True)
-
-    # Start Flask server in a background thread (same container)
-    loop = asyncio.get_running_loop()
-    t = threading.Thread(target=start_flask_server, args=(loop, application), daemon=True)
-    t.start()
+    log.info("Starting webhook: %s", webhook_url)
 
-    # Keep running forever
-    log.info("Bot started. Waiting for updates...")
-    await asyncio.Event().wait()
-
-
-def main():
-    asyncio.run(main_async())
+    # PTB's own webhook server runs on the bot's event loop (no extra thread)
+    # MUST listen on 0.0.0.0 and PORT for Fly
+    application.run_webhook(
+        listen="0.0.0.0",
+        port=PORT,
+        url_path=BOT_TOKEN,
+        webhook_url=webhook_url,
+        secret_token=WEBHOOK_SECRET,
+        allowed_updates=Update.ALL_TYPES,
+        drop_pending_updates=True,
+    )
 
 
 if __name__ == "__main__":
@@ -1,14 +1,21 @@
 import re
 from typing import Optional
+from .config import LINK_PATTERNS
 
-URL_RE = re.compile(r"(https?://\S+|t\.me/\S+|www\.\S+)", re.IGNORECASE)
+# all patterns in one alternation = one pass over the text however long the list gets;
+# only the prefix + first char is needed to flag a link, don't consume the rest of the url
+URL_RE = (
+    re.compile("(?:" + "|".join(map(re.escape, LINK_PATTERNS)) + r")\S", re.IGNORECASE)
+    if LINK_PATTERNS else None
+)
 
 def has_link(text: Optional[str]) -> bool:
-    if not text:
+    if not text or URL_RE is None:
         return False
     return bool(URL_RE.search(text))
 
 def normalize_text(text: Optional[str]) -> str:
     if not text:
         return ""
-    return re.sub(r"\s+", " ", text.strip().lower())
+    # split() drops leading/trailing whitespace and collapses runs in the same pass
+    return " ".join(text.lower().split())